@@ -7,34 +7,176 @@ with metadata, which are then pushed into SmartSuite.
 Usage:
     python app.py
     Then open http://localhost:5000
+
+This starts the single-threaded development server. For production, run
+wsgi.py under gunicorn (see that module).
+
+The app is built by create_app(), so each server worker gets its own
+SmartSuite client (and connection pool).
 """
 
+import atexit
 import os
+import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from flask import Flask, flash, redirect, render_template, request, url_for
+from flask import (
+    Blueprint,
+    Flask,
+    Request,
+    current_app,
+    flash,
+    get_flashed_messages,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
+from werkzeug.http import generate_etag
 
 from smartsuite_client import SmartSuiteClient
 
-# Load environment variables from .env at project root
-load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+ENV_PATH = os.path.join(os.path.dirname(__file__), "..", ".env")
+
+# Load environment variables from .env at project root. Variables already
+# set in the process environment take precedence.
+load_dotenv(ENV_PATH)
+
+# Uploads up to this size are parsed into memory; larger ones spill to disk.
+UPLOAD_SPOOL_MAX_SIZE = 4 * 1024 * 1024  # 4MB
+
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-change-me")
-app.config["MAX_CONTENT_LENGTH"] = 25 * 1024 * 1024  # 25MB max upload
+class IntakeRequest(Request):
+    """Request that spools uploaded files in memory up to a threshold."""
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        # Werkzeug's default sends anything over 500KB straight to a
+        # TemporaryFile; a spooled file keeps typical PDFs in RAM and only
+        # touches disk for large uploads.
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+
+
+# Submit to SmartSuite on a background thread and respond immediately.
+# Off by default: in that mode SmartSuite errors are only logged, not shown
+# to the user.
+ASYNC_SUBMIT = os.environ.get("INTAKE_ASYNC_SUBMIT", "").lower() in ("1", "true", "yes")
+SUBMIT_WORKERS = 8
 
 # Dropdown options — single source of truth
 PRODUCTS = ["Bevaloid", "Calcium Propionate", "Citric Acid", "Citric Acid Anhydrous", "Peptan"]
 DOC_TYPES = ["Allergen", "COA", "GMO", "Prodn Flow", "SDS", "Other"]
 SUPPLIERS = ["Bakery", "Ensign", "Health Nutrition", "XX", "YY"]
 
-client = SmartSuiteClient()
+# Lookup sets for validating submitted values
+PRODUCTS_SET = frozenset(PRODUCTS)
+DOC_TYPES_SET = frozenset(DOC_TYPES)
+SUPPLIERS_SET = frozenset(SUPPLIERS)
 
+intake = Blueprint("intake", __name__)
 
-@app.route("/", methods=["GET"])
-def intake_form():
-    """Serve the document intake form."""
+
+def create_app():
+    """Build the Flask app and its SmartSuite client."""
+    app = Flask(__name__)
+    app.request_class = IntakeRequest
+    # Flash messages live in the signed session cookie, so a guessable
+    # default key would let anyone forge it.
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY")
+    if not app.secret_key:
+        raise RuntimeError(
+            "FLASK_SECRET_KEY is not set. Please add it to your .env file."
+        )
+    app.config["MAX_CONTENT_LENGTH"] = 25 * 1024 * 1024  # 25MB max upload
+
+    client = SmartSuiteClient()
+    atexit.register(client.close)
+    app.extensions["smartsuite_client"] = client
+
+    # Establish the SmartSuite connection in the background so it overlaps
+    # with startup rather than the first submission.
+    threading.Thread(target=client.warm_up, daemon=True).start()
+
+    if ASYNC_SUBMIT:
+        executor = ThreadPoolExecutor(max_workers=SUBMIT_WORKERS)
+        # Registered after client.close, so it runs first: queued
+        # submissions finish before the session is closed.
+        atexit.register(executor.shutdown)
+        app.extensions["submit_executor"] = executor
+
+    app.register_blueprint(intake)
+
+    # The form only varies by flash messages, so render the plain version
+    # once up front.
+    with app.test_request_context():
+        form_html = _render_form()
+    app.extensions["intake_form"] = (form_html, generate_etag(form_html.encode()))
+
+    return app
+
+
+def _submit_in_background(client, logger, file_obj, **fields):
+    """Submit one document from a worker thread, logging the outcome."""
+    try:
+        result = client.submit_document(file_obj=file_obj, **fields)
+        if result["duplicate"]:
+            logger.info(
+                "%s was already in SmartSuite. Record ID: %s",
+                fields["filename"],
+                result["record_id"],
+            )
+        else:
+            logger.info(
+                "Submitted %s to SmartSuite. Record ID: %s",
+                fields["filename"],
+                result["record_id"],
+            )
+    except Exception:
+        logger.exception("Submission of %s to SmartSuite failed", fields["filename"])
+    finally:
+        file_obj.close()
+
+
+def _metadata_errors(product, doc_type, supplier, filename):
+    """Validate the submitted metadata fields; returns a list of messages."""
+    errors = []
+    if not product or product not in PRODUCTS_SET:
+        errors.append("Please select a valid Product.")
+    if not doc_type or doc_type not in DOC_TYPES_SET:
+        errors.append("Please select a valid Document Type.")
+    if not supplier or supplier not in SUPPLIERS_SET:
+        errors.append("Please select a valid Supplier.")
+    if not filename:
+        errors.append("Please enter a Filename.")
+    return errors
+
+
+def _config_error(client):
+    """Return a message if SmartSuite configuration is incomplete, else None."""
+    missing_config = client.validate_config()
+    if not missing_config:
+        return None
+    return (
+        f"SmartSuite configuration incomplete. Missing: {', '.join(missing_config)}. "
+        "Please check your .env file."
+    )
+
+
+def _spool_copy(stream):
+    """Copy stream into a new spooled file, rewound and ready to read."""
+    file_obj = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+    shutil.copyfileobj(stream, file_obj, 1024 * 1024)
+    file_obj.seek(0)
+    return file_obj
+
+
+def _render_form():
     return render_template(
         "intake.html",
         products=PRODUCTS,
@@ -43,7 +185,22 @@ def intake_form():
     )
 
 
-@app.route("/submit", methods=["POST"])
+@intake.route("/", methods=["GET"])
+def intake_form():
+    """Serve the document intake form."""
+    if get_flashed_messages():
+        return _render_form()
+
+    form_html, etag = current_app.extensions["intake_form"]
+    response = make_response(form_html)
+    response.set_etag(etag)
+    # Revalidate on every visit: serving a stored copy after the redirect
+    # from /submit would hide that submission's flash messages.
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@intake.route("/submit", methods=["POST"])
 def submit():
     """Handle form submission: validate, save to SmartSuite."""
     # Collect form data
@@ -52,72 +209,149 @@ def submit():
     supplier = request.form.get("supplier", "").strip()
     filename = request.form.get("filename", "").strip()
     pdf_file = request.files.get("pdf_document")
+    upload_name = pdf_file.filename if pdf_file else ""
 
     # Validate all fields present
-    errors = []
-    if not product or product not in PRODUCTS:
-        errors.append("Please select a valid Product.")
-    if not doc_type or doc_type not in DOC_TYPES:
-        errors.append("Please select a valid Document Type.")
-    if not supplier or supplier not in SUPPLIERS:
-        errors.append("Please select a valid Supplier.")
-    if not filename:
-        errors.append("Please enter a Filename.")
-    if not pdf_file or pdf_file.filename == "":
+    errors = _metadata_errors(product, doc_type, supplier, filename)
+    if not upload_name:
         errors.append("Please attach a PDF document.")
-    elif not pdf_file.filename.lower().endswith(".pdf"):
+    elif not upload_name.lower().endswith(".pdf"):
         errors.append("Only PDF files are accepted.")
 
     if errors:
         for error in errors:
             flash(error, "error")
-        return redirect(url_for("intake_form"))
+        return redirect(url_for(".intake_form"))
+
+    client = current_app.extensions["smartsuite_client"]
 
     # Check SmartSuite configuration
-    missing_config = client.validate_config()
-    if missing_config:
-        flash(
-            f"SmartSuite configuration incomplete. Missing: {', '.join(missing_config)}. "
-            "Please check your .env file.",
-            "error",
-        )
-        return redirect(url_for("intake_form"))
+    config_error = _config_error(client)
+    if config_error:
+        flash(config_error, "error")
+        return redirect(url_for(".intake_form"))
 
-    # Save uploaded file to temp location, then submit
-    tmp_dir = os.path.join(os.path.dirname(__file__), "..", ".tmp")
-    os.makedirs(tmp_dir, exist_ok=True)
+    executor = current_app.extensions.get("submit_executor")
+    if executor:
+        # Werkzeug closes the upload when this request ends, so the worker
+        # gets its own spooled copy.
+        executor.submit(
+            _submit_in_background,
+            client,
+            current_app.logger,
+            _spool_copy(pdf_file.stream),
+            product=product,
+            doc_type=doc_type,
+            supplier=supplier,
+            filename=filename,
+        )
+        flash("Document received and is being submitted to SmartSuite.", "success")
+        return redirect(url_for(".intake_form"))
 
-    tmp_path = None
+    # Stream the upload straight to SmartSuite. IntakeRequest has already
+    # spooled it (in memory, or on disk if large), so there is no need to
+    # copy it into .tmp/ first.
     try:
-        with tempfile.NamedTemporaryFile(
-            dir=tmp_dir, suffix=".pdf", delete=False
-        ) as tmp:
-            pdf_file.save(tmp)
-            tmp_path = tmp.name
-
         result = client.submit_document(
             product=product,
             doc_type=doc_type,
             supplier=supplier,
             filename=filename,
-            file_path=tmp_path,
+            file_obj=pdf_file.stream,
         )
 
-        flash(
-            f"Document submitted successfully. Record ID: {result['record_id']}",
-            "success",
-        )
+        if result["duplicate"]:
+            flash(
+                "This PDF has already been submitted with the same details. "
+                f"Existing Record ID: {result['record_id']}",
+                "success",
+            )
+        else:
+            flash(
+                f"Document submitted successfully. Record ID: {result['record_id']}",
+                "success",
+            )
 
     except Exception as e:
         flash(f"Submission failed: {str(e)}", "error")
 
+    return redirect(url_for(".intake_form"))
+
+
+@intake.route("/submit_raw", methods=["POST"])
+def submit_raw():
+    """
+    Handle a programmatic submission: metadata in the query string
+    (product, doc_type, supplier, filename) and the PDF as the raw
+    application/pdf request body. Skips multipart parsing entirely.
+
+    Responds with JSON: 201 with record_id for a new record, 200 with the
+    existing record_id for an exact duplicate, 202 when queued in background
+    mode, 400 for invalid input, 411 for a body without Content-Length
+    (chunked uploads are not supported), 413 for a body over MAX_CONTENT_LENGTH,
+    500/502 for configuration/SmartSuite errors.
+    """
+    product = request.args.get("product", "").strip()
+    doc_type = request.args.get("doc_type", "").strip()
+    supplier = request.args.get("supplier", "").strip()
+    filename = request.args.get("filename", "").strip()
+
+    # Chunked bodies carry no Content-Length, which the size check needs.
+    if request.content_length is None:
+        return jsonify(errors=["Content-Length required."]), 411
+
+    errors = _metadata_errors(product, doc_type, supplier, filename)
+    if request.mimetype != "application/pdf":
+        errors.append("Only PDF files are accepted.")
+    elif not request.content_length:
+        errors.append("Please attach a PDF document.")
+    if errors:
+        return jsonify(errors=errors), 400
+
+    # Checked up front so the client gets JSON rather than werkzeug's
+    # HTML 413 page when reading request.stream hits the limit.
+    max_length = current_app.config["MAX_CONTENT_LENGTH"]
+    if request.content_length > max_length:
+        return (
+            jsonify(errors=[f"PDF exceeds the {max_length // (1024 * 1024)}MB limit."]),
+            413,
+        )
+
+    client = current_app.extensions["smartsuite_client"]
+    config_error = _config_error(client)
+    if config_error:
+        return jsonify(errors=[config_error]), 500
+
+    # request.stream is the unparsed body, capped at MAX_CONTENT_LENGTH.
+    file_obj = _spool_copy(request.stream)
+    fields = {
+        "product": product,
+        "doc_type": doc_type,
+        "supplier": supplier,
+        "filename": filename,
+    }
+
+    executor = current_app.extensions.get("submit_executor")
+    if executor:
+        executor.submit(
+            _submit_in_background, client, current_app.logger, file_obj, **fields
+        )
+        return jsonify(status="accepted"), 202
+
+    try:
+        result = client.submit_document(file_obj=file_obj, **fields)
+    except Exception as e:
+        return jsonify(errors=[f"Submission failed: {str(e)}"]), 502
     finally:
-        # Clean up temp file
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        file_obj.close()
 
-    return redirect(url_for("intake_form"))
+    # Nothing is created for a duplicate, so it isn't a 201.
+    status = 200 if result["duplicate"] else 201
+    return (
+        jsonify(record_id=result["record_id"], duplicate=result["duplicate"]),
+        status,
+    )
 
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the Document Intake app, picked up automatically
+when gunicorn is started from execution/.
+
+Each worker runs gevent greenlets, so a submission waiting on SmartSuite
+doesn't hold an OS thread; one worker can keep up to worker_connections
+submissions in flight. This matches the per-worker connection pool size
+in SmartSuiteClient, so greenlets never wait on a full pool.
+
+Usage:
+    cd execution
+    gunicorn wsgi:application
+"""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "gevent"
+worker_connections = 100
+
+# Preloading is not supported: gevent must patch ssl, sockets and threads
+# before the app (and requests) is imported, which only happens when each
+# worker loads the app itself. The startup warm-up in create_app() then runs
+# as a greenlet in the worker that owns the connection pool.
+preload_app = False
@@ -2,13 +2,40 @@
 SmartSuite API client for the Document Intake process.
 
 Handles creating records and uploading file attachments
-to the SmartSuite Documents table.
+to the SmartSuite Documents table. This is the only SmartSuite client;
+it uses these endpoints:
+    POST /files/                                  upload a PDF
+    POST /applications/{table_id}/records/        create one record
+    POST /applications/{table_id}/records/bulk/   create several records
+    POST /applications/{table_id}/records/list/   find duplicates by SHA-256
 
 SmartSuite API docs: https://developers.smartsuite.com/
 """
 
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
+
+
+# Chunk size used when sending request bodies (file uploads) to the socket.
+# urllib3 defaults to 16KB; larger blocks cut syscalls on multi-MB PDFs.
+UPLOAD_BLOCK_SIZE = 256 * 1024
+
+
+class _LargeBlockAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections send bodies in UPLOAD_BLOCK_SIZE chunks."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("blocksize", UPLOAD_BLOCK_SIZE)
+        super().init_poolmanager(*args, **kwargs)
 
 
 class SmartSuiteClient:
@@ -16,6 +43,17 @@ class SmartSuiteClient:
 
     BASE_URL = "https://app.smartsuite.com/api/v1"
 
+    # Parallel file uploads for batch submissions
+    UPLOAD_WORKERS = 8
+
+    # Retry policy for transient SmartSuite failures
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.3  # seconds; doubles on each attempt
+    RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+    # Most records checked when looking for an earlier identical submission
+    DUPLICATE_LOOKUP_LIMIT = 100
+
     def __init__(self):
         self.api_key = os.environ.get("SMARTSUITE_API_KEY", "")
         self.workspace_id = os.environ.get("SMARTSUITE_WORKSPACE_ID", "")
@@ -31,18 +69,97 @@ class SmartSuiteClient:
             "document": os.environ.get("SS_FIELD_DOCUMENT", ""),
         }
 
-    def _headers(self):
-        return {
+        # Optional text field holding each PDF's SHA-256. When set, identical
+        # re-uploads are matched to the existing record instead of re-sent.
+        self.sha256_field_id = os.environ.get("SS_FIELD_SHA256", "")
+
+        # Endpoint URLs depend only on the table, so build them once.
+        self._files_url = f"{self.BASE_URL}/files/"
+        self._records_url = f"{self.BASE_URL}/applications/{self.table_id}/records/"
+        self._bulk_records_url = f"{self._records_url}bulk/"
+        self._list_records_url = f"{self._records_url}list/"
+
+        # Request headers never change for a client, so build them once.
+        self._file_upload_headers = {
             "Authorization": f"Token {self.api_key}",
             "Account-Id": self.workspace_id,
+        }
+        self._json_headers = {
+            **self._file_upload_headers,
             "Content-Type": "application/json",
         }
 
+        # Built on first use; see the session property.
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        The pooled session for this process. A forked child never reuses
+        its parent's sockets: it builds a fresh session on first use.
+
+        The lock stops concurrent first calls (batch upload threads, the
+        warm-up thread, background submissions) from each building their
+        own session and orphaning the others' sockets.
+        """
+        pid = os.getpid()
+        if self._session_pid != pid:
+            with self._session_lock:
+                if self._session_pid != pid:
+                    # _session is assigned before _session_pid, so the
+                    # unlocked check above never sees a stale session.
+                    self._session = self._new_session()
+                    self._session_pid = pid
+        return self._session
+
+    def _new_session(self):
+        """
+        Build the pooled session used for every call, so each call reuses
+        the same keep-alive TLS connection to SmartSuite instead of
+        reconnecting. The pool is sized for a gevent worker's concurrent
+        submissions (worker_connections in gunicorn.conf.py). Auth headers
+        are set once here; Content-Type is set per request.
+
+        The adapter retries connection failures for every request, but
+        retries 5xx responses only for idempotent methods: record creation
+        must not be repeated once SmartSuite has received it. POSTs that are
+        safe to repeat (file uploads, record lookups) retry 5xx responses
+        through _send_with_retries.
+        """
+        session = requests.Session()
+        retries = Retry(
+            total=self.MAX_RETRIES,
+            backoff_factor=self.RETRY_BACKOFF,
+            status_forcelist=self.RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _LargeBlockAdapter(
+            pool_connections=10, pool_maxsize=100, max_retries=retries
+        )
+        session.mount("https://", adapter)
+        session.headers.update(self._file_headers())
+        return session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the pooled HTTP session."""
+        with self._session_lock:
+            if self._session is not None and self._session_pid == os.getpid():
+                self._session.close()
+
+    def _headers(self):
+        return self._json_headers
+
     def _file_headers(self):
-        return {
-            "Authorization": f"Token {self.api_key}",
-            "Account-Id": self.workspace_id,
-        }
+        return self._file_upload_headers
 
     def validate_config(self):
         """Check that all required configuration is present."""
@@ -58,22 +175,66 @@ class SmartSuiteClient:
                 missing.append(f"SS_FIELD_{name.upper()}")
         return missing
 
-    def upload_file(self, file_path, file_name):
+    def warm_up(self):
+        """
+        Open a keep-alive connection to SmartSuite ahead of the first
+        submission so it doesn't pay the TCP/TLS handshake.
+
+        Failures are ignored — the real request will simply connect itself.
+        """
+        try:
+            self.session.head(
+                f"{self.BASE_URL}/applications/{self.table_id}/", timeout=5
+            )
+        except requests.RequestException:
+            pass
+
+    def _send_with_retries(self, send):
+        """
+        Call send() until it returns a response outside RETRY_STATUSES,
+        backing off between attempts. Only for requests that are safe to
+        repeat but that the adapter won't retry (POST).
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(self.RETRY_BACKOFF * 2 ** (attempt - 1))
+            response = send()
+            if response.status_code not in self.RETRY_STATUSES:
+                break
+        return response
+
+    def upload_file(self, file_obj, file_name):
         """
         Upload a file to SmartSuite and return the file reference.
 
+        file_obj is any readable binary file-like object (e.g. the stream of
+        an uploaded werkzeug FileStorage); it is read from its start.
+
         This must be called before creating a record when the document
         field is required.
+
+        Transient 5xx responses are retried with backoff, re-reading
+        file_obj, so the user doesn't have to re-submit the PDF.
         """
-        upload_url = f"{self.BASE_URL}/files/"
-        with open(file_path, "rb") as f:
-            files = {"file": (file_name, f, "application/pdf")}
-            response = requests.post(
+        upload_url = self._files_url
+
+        def send():
+            file_obj.seek(0)
+            # Stream the multipart body from file_obj in chunks rather than
+            # letting requests build the whole envelope in memory. The
+            # encoder can't be rewound, so urllib3 can't retry it for us.
+            body = _UploadReader(file_obj)
+            encoder = MultipartEncoder(
+                fields={"file": (file_name, body, "application/pdf")}
+            )
+            return self.session.post(
                 upload_url,
-                files=files,
-                headers=self._file_headers(),
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
                 timeout=120,
             )
+
+        response = self._send_with_retries(send)
         if not response.ok:
             detail = response.text[:500]
             raise requests.HTTPError(
@@ -81,15 +242,9 @@ class SmartSuiteClient:
             )
         return response.json()
 
-    def create_record(self, product, doc_type, supplier, filename, file_data):
-        """
-        Create a new record in the SmartSuite Documents table,
-        including the file attachment.
-
-        Returns the record ID on success, or raises an exception on failure.
-        """
-        url = f"{self.BASE_URL}/applications/{self.table_id}/records/"
-
+    def _record_payload(
+        self, product, doc_type, supplier, filename, file_data, sha256=None
+    ):
         payload = {
             "title": filename,
             self.field_ids["product"]: product,
@@ -98,8 +253,82 @@ class SmartSuiteClient:
             self.field_ids["filename"]: filename,
             self.field_ids["document"]: [file_data],
         }
+        if self.sha256_field_id and sha256:
+            payload[self.sha256_field_id] = sha256
+        return payload
+
+    def find_records_by_sha256(self, sha256):
+        """
+        Return the existing records whose stored SHA-256 matches (at most
+        DUPLICATE_LOOKUP_LIMIT), or an empty list if no SHA-256 field is
+        configured.
+
+        Listing is read-only, so transient 5xx responses are retried even
+        though it is a POST.
+        """
+        if not self.sha256_field_id:
+            return []
+
+        url = self._list_records_url
+        payload = {
+            "filter": {
+                "operator": "and",
+                "fields": [
+                    {
+                        "field": self.sha256_field_id,
+                        "comparison": "is",
+                        "value": sha256,
+                    }
+                ],
+            }
+        }
+
+        body = orjson.dumps(payload)
+
+        response = self._send_with_retries(
+            lambda: self.session.post(
+                url,
+                params={"limit": self.DUPLICATE_LOOKUP_LIMIT},
+                data=body,
+                headers=self._headers(),
+                timeout=30,
+            )
+        )
+        if not response.ok:
+            detail = response.text[:500]
+            raise requests.HTTPError(
+                f"{response.status_code} for {url}: {detail}", response=response
+            )
+
+        return response.json().get("items", [])
+
+    def _matches_submission(self, record, product, doc_type, supplier, filename):
+        """True if record holds exactly this submission's metadata."""
+        return (
+            record.get(self.field_ids["product"]) == product
+            and record.get(self.field_ids["type"]) == doc_type
+            and record.get(self.field_ids["supplier"]) == supplier
+            and record.get(self.field_ids["filename"]) == filename
+        )
+
+    def create_record(
+        self, product, doc_type, supplier, filename, file_data, sha256=None
+    ):
+        """
+        Create a new record in the SmartSuite Documents table,
+        including the file attachment.
+
+        Returns the record ID on success, or raises an exception on failure.
+        """
+        url = self._records_url
+
+        payload = self._record_payload(
+            product, doc_type, supplier, filename, file_data, sha256
+        )
 
-        response = requests.post(url, json=payload, headers=self._headers(), timeout=30)
+        response = self.session.post(
+            url, data=orjson.dumps(payload), headers=self._headers(), timeout=30
+        )
         if not response.ok:
             detail = response.text[:500]
             raise requests.HTTPError(
@@ -109,23 +338,147 @@ class SmartSuiteClient:
         data = response.json()
         return data.get("id")
 
-    def submit_document(self, product, doc_type, supplier, filename, file_path):
+    def submit_document(self, product, doc_type, supplier, filename, file_obj):
         """
         Full intake submission: upload the PDF, then create the record
         with all fields including the file attachment.
 
-        Returns dict with record_id and file info on success.
+        If a SHA-256 field is configured and a record with the same PDF
+        and the same product, type, supplier and filename already exists,
+        nothing is uploaded and that record is returned with duplicate set.
+        The same PDF under different metadata (e.g. one SDS covering
+        several products) still gets its own record.
+
+        Returns dict with record_id, file info and duplicate on success.
         Raises requests.HTTPError on API failure.
         """
-        safe_name = filename if filename.lower().endswith(".pdf") else f"{filename}.pdf"
+        sha256 = _file_sha256(file_obj) if self.sha256_field_id else None
+        if sha256:
+            for record in self.find_records_by_sha256(sha256):
+                if self._matches_submission(
+                    record, product, doc_type, supplier, filename
+                ):
+                    return {
+                        "record_id": record.get("id"),
+                        "file_info": None,
+                        "duplicate": True,
+                    }
 
-        file_info = self.upload_file(file_path=file_path, file_name=safe_name)
+        file_info = self.upload_file(file_obj=file_obj, file_name=_pdf_name(filename))
 
         record_id = self.create_record(
-            product, doc_type, supplier, filename, file_data=file_info
+            product, doc_type, supplier, filename, file_data=file_info, sha256=sha256
         )
 
         return {
             "record_id": record_id,
             "file_info": file_info,
+            "duplicate": False,
         }
+
+    def create_records(self, records):
+        """
+        Create several records in one call to the SmartSuite bulk endpoint.
+
+        records is a list of dicts with product, doc_type, supplier,
+        filename and file_data keys (as for create_record).
+
+        Returns the new record IDs in the same order as records.
+        """
+        url = self._bulk_records_url
+
+        payload = {"items": [self._record_payload(**record) for record in records]}
+
+        response = self.session.post(
+            url, data=orjson.dumps(payload), headers=self._headers(), timeout=60
+        )
+        if not response.ok:
+            detail = response.text[:500]
+            raise requests.HTTPError(
+                f"{response.status_code} for {url}: {detail}", response=response
+            )
+
+        return [item.get("id") for item in response.json()]
+
+    def submit_documents(self, documents):
+        """
+        Batch intake submission: upload all PDFs in parallel, then create
+        every record with a single bulk request.
+
+        documents is a list of dicts with product, doc_type, supplier,
+        filename and file_obj keys (the arguments of submit_document).
+        Each PDF's SHA-256 is stored if that field is configured, but
+        existing records are not looked up.
+
+        Returns a list of dicts with record_id and file info, in input order.
+        Raises requests.HTTPError on API failure; no records are created
+        if any upload fails.
+        """
+        if not documents:
+            return []
+
+        def upload(document):
+            file_obj = document["file_obj"]
+            sha256 = _file_sha256(file_obj) if self.sha256_field_id else None
+            file_info = self.upload_file(
+                file_obj=file_obj, file_name=_pdf_name(document["filename"])
+            )
+            return file_info, sha256
+
+        workers = min(self.UPLOAD_WORKERS, len(documents))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            uploads = list(executor.map(upload, documents))
+
+        record_ids = self.create_records(
+            [
+                {
+                    "product": document["product"],
+                    "doc_type": document["doc_type"],
+                    "supplier": document["supplier"],
+                    "filename": document["filename"],
+                    "file_data": file_info,
+                    "sha256": sha256,
+                }
+                for document, (file_info, sha256) in zip(documents, uploads)
+            ]
+        )
+
+        return [
+            {"record_id": record_id, "file_info": file_info}
+            for record_id, (file_info, _) in zip(record_ids, uploads)
+        ]
+
+
+class _UploadReader:
+    """
+    Read-only view of a file object that MultipartEncoder can size without
+    calling fileno(), which would force a SpooledTemporaryFile to roll over
+    to disk. len is the number of bytes left to read, as the encoder expects.
+    """
+
+    def __init__(self, file_obj):
+        self._file_obj = file_obj
+        start = file_obj.tell()
+        self._size = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(start)
+
+    @property
+    def len(self):
+        return self._size - self._file_obj.tell()
+
+    def read(self, length=-1):
+        return self._file_obj.read(length)
+
+
+def _file_sha256(file_obj):
+    """Return the hex SHA-256 of file_obj's full contents."""
+    file_obj.seek(0)
+    digest = hashlib.sha256()
+    while chunk := file_obj.read(1024 * 1024):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pdf_name(filename):
+    """Return filename with a .pdf extension, adding one if missing."""
+    return filename if filename.lower().endswith(".pdf") else f"{filename}.pdf"
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for running the Document Intake app in production.
+
+Usage:
+    cd execution
+    gunicorn wsgi:application
+
+Worker settings live in gunicorn.conf.py.
+"""
+
+from app import create_app
+
+application = create_app()